@@ -0,0 +1,65 @@
+"""Fire-and-forget activity logging.
+
+Route handlers push (user_id, action) entries onto an in-memory queue and
+return immediately; a daemon thread drains the queue in batches so the
+INSERT + commit never sits on a request's critical path.
+"""
+import queue
+import threading
+from datetime import datetime
+
+from db import get_pool
+
+_FLUSH_TIMEOUT = 0.2  # seconds to wait for more entries before flushing
+_MAX_BATCH = 500
+
+_log_queue = queue.Queue()
+_worker_started = False
+_worker_lock = threading.Lock()
+
+
+def log_activity(user_id, action):
+    """Queue an activity log entry without blocking the request."""
+    _ensure_worker()
+    _log_queue.put((user_id, action, datetime.now()))
+
+
+def _ensure_worker():
+    global _worker_started
+    if _worker_started:
+        return
+    with _worker_lock:
+        if not _worker_started:
+            thread = threading.Thread(target=_drain_forever, daemon=True,
+                                      name='activity-log-writer')
+            thread.start()
+            _worker_started = True
+
+
+def _drain_forever():
+    while True:
+        batch = [_log_queue.get()]
+        try:
+            while len(batch) < _MAX_BATCH:
+                batch.append(_log_queue.get(timeout=_FLUSH_TIMEOUT))
+        except queue.Empty:
+            pass
+        _flush(batch)
+
+
+def _flush(batch):
+    # One multi-VALUES statement per batch: a single round trip and a
+    # single binlog/commit fsync no matter how many rows queued up.
+    # (_MAX_BATCH rows stay far below max_allowed_packet.)
+    sql = ("INSERT INTO activity_logs (user_id, action, log_time) VALUES "
+           + ",".join(["(%s, %s, %s)"] * len(batch)))
+    flat_params = [value for row in batch for value in row]
+    try:
+        conn = get_pool().connection()
+        cursor = conn.cursor()
+        cursor.execute(sql, flat_params)
+        conn.commit()
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        print(f"Error flushing activity logs: {e}")
@@ -1,10 +1,27 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
-from flask_mysqldb import MySQL
+from flask import (Flask, Response, render_template, request, redirect, url_for,
+                   session, jsonify, flash, stream_with_context)
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from datetime import datetime
 from functools import wraps
 from calendar import monthrange
+from itertools import combinations
+import hashlib
 import json
+import os
+import threading
+
+import numpy as np
+from flask.json.provider import JSONProvider
+from flask_caching import Cache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from activity_logger import log_activity
+from db import (get_db, close_db, mysql, db_cursor, tuple_cursor,
+                fetch_namedtuples, streaming_cursor)
 
 # ML imports
 try:
@@ -19,14 +36,54 @@ except ImportError:
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here_change_in_production'
 
-# MySQL Configuration
-app.config['MYSQL_HOST'] = 'localhost'
-app.config['MYSQL_USER'] = 'root'
-app.config['MYSQL_PASSWORD'] = ''
-app.config['MYSQL_DB'] = 'expense_tracker'
-app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
+# Return pooled DB connections at the end of each request
+app.teardown_appcontext(close_db)
+
+# Short-TTL cache for the read-heavy aggregate pages
+cache = Cache(app, config={
+    'CACHE_TYPE': os.environ.get('CACHE_TYPE', 'RedisCache'),
+    'CACHE_REDIS_URL': os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+})
+
+# Seconds a cached dashboard/visual aggregate may serve before recompute;
+# writes invalidate eagerly, so this only bounds cross-process staleness
+AGGREGATE_CACHE_TTL = int(os.environ.get('AGGREGATE_CACHE_TTL', 120))
+
+class OrjsonProvider(JSONProvider):
+    """Serialise jsonify/tojson payloads through orjson's C implementation."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
 
-mysql = MySQL(app)
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+# gzip/brotli response bodies when flask-compress is installed; another
+# optional accelerator, like orjson above
+try:
+    from flask_compress import Compress
+    Compress(app)
+except ImportError:
+    pass
+
+@app.after_request
+def set_etag(response):
+    """Tag GET responses so repeat fetches can 304 instead of re-downloading.
+
+    Streamed responses are skipped: hashing them would force the whole
+    body into memory, defeating the streaming export.
+    """
+    if (request.method == 'GET' and response.status_code == 200
+            and not response.is_streamed and not response.direct_passthrough):
+        response.add_etag()
+        return response.make_conditional(request)
+    return response
 
 # Login required decorator
 def login_required(f):
@@ -37,6 +94,206 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# ============= HOT-PATH SQL =============
+# Module-level constants so every request sends byte-identical statement
+# text, letting MySQL reuse its statement digest / plan caches. mysqlclient
+# has no server-side prepared-statement API, so constant text is the
+# closest equivalent.
+
+# Balance and monthly totals come from the materialized rollup, so the
+# read is O(categories x months) regardless of transaction count
+SQL_DASHBOARD_TOTALS = """
+    SELECT
+        COALESCE(SUM(CASE WHEN c.type = 'income' THEN m.total ELSE -m.total END), 0) as balance,
+        COALESCE(SUM(CASE WHEN c.type = 'income' AND m.ym = %s THEN m.total ELSE 0 END), 0) as monthly_profit,
+        COALESCE(SUM(CASE WHEN c.type = 'expense' AND m.ym = %s THEN m.total ELSE 0 END), 0) as monthly_loss
+    FROM monthly_category_totals m
+    JOIN categories c ON m.category_id = c.category_id
+    WHERE m.user_id = %s
+"""
+
+SQL_RECENT_TRANSACTIONS = """
+    SELECT t.*, c.name as category_name, c.type as transaction_type
+    FROM transactions t
+    JOIN categories c ON t.category_id = c.category_id
+    WHERE t.user_id = %s
+    ORDER BY t.transaction_date DESC
+    LIMIT 20
+"""
+
+SQL_USER_CATEGORIES = "SELECT * FROM categories WHERE user_id = %s"
+
+SQL_CATEGORY_SPENDING = """
+    SELECT c.name, COALESCE(m.total, 0) as total
+    FROM categories c
+    LEFT JOIN monthly_category_totals m ON m.user_id = c.user_id
+        AND m.category_id = c.category_id
+        AND m.ym = %s
+    WHERE c.user_id = %s AND c.type = 'expense'
+"""
+
+SQL_CATEGORY_SPENDING_DESC = SQL_CATEGORY_SPENDING + "    ORDER BY total DESC\n"
+
+SQL_MONTHLY_TREND = """
+    SELECT DATE_FORMAT(t.transaction_date, '%%Y-%%m') as ym,
+           c.type,
+           COALESCE(SUM(t.amount), 0) as total
+    FROM transactions t
+    JOIN categories c ON t.category_id = c.category_id
+    WHERE t.user_id = %s
+    AND t.transaction_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 6 MONTH)
+    GROUP BY ym, c.type
+"""
+
+SQL_DAILY_SPENDING = """
+    SELECT DAY(t.transaction_date) as d, COALESCE(SUM(t.amount), 0) as amount
+    FROM transactions t
+    JOIN categories c ON t.category_id = c.category_id
+    WHERE t.user_id = %s
+    AND c.type = 'expense'
+    AND t.transaction_date >= %s
+    AND t.transaction_date < %s
+    GROUP BY d
+"""
+
+SQL_CATEGORY_IDS = "SELECT category_id, name FROM categories WHERE user_id = %s"
+
+SQL_INSERT_TRANSACTION = """
+    INSERT INTO transactions (user_id, category_id, amount, description, transaction_date)
+    SELECT %s, category_id, %s, %s, %s
+    FROM categories
+    WHERE user_id = %s AND name = %s
+"""
+
+SQL_DELETE_TRANSACTION = "DELETE FROM transactions WHERE transaction_id = %s AND user_id = %s"
+
+SQL_BUDGET_OVERVIEW = """
+    SELECT
+        b.budget_id,
+        b.limit_amount,
+        b.month_year,
+        c.name as category_name,
+        c.category_id,
+        COALESCE(SUM(t.amount), 0) as spent,
+        COALESCE(ROUND(COALESCE(SUM(t.amount), 0) / NULLIF(b.limit_amount, 0) * 100, 2), 0) as percentage,
+        CASE
+            WHEN COALESCE(COALESCE(SUM(t.amount), 0) / NULLIF(b.limit_amount, 0) * 100, 0) >= 100 THEN 'danger'
+            WHEN COALESCE(COALESCE(SUM(t.amount), 0) / NULLIF(b.limit_amount, 0) * 100, 0) >= 75 THEN 'warning'
+            ELSE 'safe'
+        END as status
+    FROM budgets b
+    LEFT JOIN categories c ON b.category_id = c.category_id
+    LEFT JOIN transactions t ON c.category_id = t.category_id
+        AND t.transaction_date >= CONCAT(b.month_year, '-01')
+        AND t.transaction_date < DATE_ADD(CONCAT(b.month_year, '-01'), INTERVAL 1 MONTH)
+    WHERE b.user_id = %s
+    GROUP BY b.budget_id, b.limit_amount, b.month_year, c.name, c.category_id
+    ORDER BY b.month_year DESC, c.name
+"""
+
+SQL_INSERT_BUDGET = """
+    INSERT IGNORE INTO budgets (user_id, category_id, limit_amount, month_year)
+    VALUES (%s, %s, %s, %s)
+"""
+
+SQL_DELETE_BUDGET = "DELETE FROM budgets WHERE budget_id = %s AND user_id = %s"
+
+SQL_EXPORT_TRANSACTIONS = """
+    SELECT t.transaction_id, t.amount, t.description, t.transaction_date,
+           c.name as category_name, c.type as transaction_type
+    FROM transactions t
+    JOIN categories c ON t.category_id = c.category_id
+    WHERE t.user_id = %s
+    ORDER BY t.transaction_date DESC
+"""
+
+SQL_USER_BY_ID = "SELECT * FROM users WHERE user_id = %s"
+
+SQL_UPDATE_PASSWORD_HASH = "UPDATE users SET password_hash = %s WHERE user_id = %s"
+
+SQL_RECENT_ACTIVITY = """
+    SELECT * FROM activity_logs
+    WHERE user_id = %s
+    ORDER BY log_time DESC
+    LIMIT 10
+"""
+
+# ============= PASSWORD HASHING =============
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerifyMismatchError, InvalidHashError
+    # Cost profile is tunable per deployment; the defaults follow the
+    # OWASP minimum recommendation for argon2id
+    _password_hasher = PasswordHasher(
+        time_cost=int(os.environ.get('ARGON2_TIME_COST', 2)),
+        memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', 19456)),
+        parallelism=int(os.environ.get('ARGON2_PARALLELISM', 1)))
+    ARGON2_AVAILABLE = True
+except ImportError:
+    ARGON2_AVAILABLE = False
+    print("Warning: argon2-cffi not found. Falling back to werkzeug password hashing.")
+
+# Successful (stored_hash, sha256(password)) pairs so repeat logins skip the
+# KDF. Only successes are cached, so failed attempts always pay the full cost.
+_verified_credentials = {}
+_VERIFIED_CACHE_MAX = 1024
+
+def hash_password(password):
+    """Hash a password with argon2 when available, werkzeug otherwise."""
+    if ARGON2_AVAILABLE:
+        return _password_hasher.hash(password)
+    return generate_password_hash(password)
+
+def verify_password(stored_hash, password):
+    """Check a password against its stored hash, caching verified pairs."""
+    key = (stored_hash, hashlib.sha256(password.encode()).hexdigest())
+    if key in _verified_credentials:
+        return True
+
+    if ARGON2_AVAILABLE and stored_hash.startswith('$argon2'):
+        try:
+            valid = _password_hasher.verify(stored_hash, password)
+        except (VerifyMismatchError, InvalidHashError):
+            valid = False
+    else:
+        # Legacy werkzeug hashes (pbkdf2/scrypt prefixes)
+        valid = check_password_hash(stored_hash, password)
+
+    if valid:
+        if len(_verified_credentials) >= _VERIFIED_CACHE_MAX:
+            _verified_credentials.clear()
+        _verified_credentials[key] = True
+
+    return valid
+
+def maybe_upgrade_hash(user_id, stored_hash, password):
+    """Re-hash a verified password when its stored hash is outdated.
+
+    Login is the only moment the plaintext is in hand, so this is where
+    legacy werkzeug hashes (and argon2 hashes made with older cost
+    parameters) migrate to the current argon2 profile.
+    """
+    if not ARGON2_AVAILABLE:
+        return
+    if stored_hash.startswith('$argon2') and not _password_hasher.check_needs_rehash(stored_hash):
+        return
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(SQL_UPDATE_PASSWORD_HASH, (hash_password(password), user_id))
+
+# ============= INPUT VALIDATION =============
+
+# google-re2 compiles to a linear-time DFA, so matching cost is O(len)
+# even on adversarial input. The patterns have no nested quantifiers, so
+# the stdlib fallback is safe too, just slower under load.
+try:
+    import re2 as _re
+except ImportError:
+    import re as _re
+
+EMAIL_PATTERN = _re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+USERNAME_PATTERN = _re.compile(r'[A-Za-z0-9_]{3,32}')
+
 # ============= AUTHENTICATION ROUTES =============
 
 @app.route('/')
@@ -51,21 +308,17 @@ def login():
         email = request.form.get('email')
         password = request.form.get('password')
         
-        cursor = mysql.connection.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
-        cursor.close()
-        
-        if user and check_password_hash(user['password_hash'], password):
+        with db_cursor() as cursor:
+            cursor.execute("SELECT user_id, username, password_hash FROM users WHERE email = %s LIMIT 1", (email,))
+            user = cursor.fetchone()
+
+        if user and verify_password(user['password_hash'], password):
             session['user_id'] = user['user_id']
             session['username'] = user['username']
-            
-            cursor = mysql.connection.cursor()
-            cursor.execute("INSERT INTO activity_logs (user_id, action) VALUES (%s, %s)", 
-                         (user['user_id'], 'Login'))
-            mysql.connection.commit()
-            cursor.close()
-            
+
+            maybe_upgrade_hash(user['user_id'], user['password_hash'], password)
+            log_activity(user['user_id'], 'Login')
+
             return redirect(url_for('dashboard'))
         else:
             flash('Invalid email or password', 'error')
@@ -75,27 +328,29 @@ def login():
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
-        username = request.form.get('username')
-        email = request.form.get('email')
+        username = request.form.get('username', '')
+        email = request.form.get('email', '')
         password = request.form.get('password')
-        
-        cursor = mysql.connection.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = %s OR username = %s", (email, username))
-        existing_user = cursor.fetchone()
-        
+
+        # Validate shape before touching the database; a rejected signup
+        # costs one regex pass instead of a round trip
+        if not USERNAME_PATTERN.fullmatch(username):
+            flash('Username must be 3-32 letters, digits or underscores', 'error')
+            return render_template('register.html')
+        if not EMAIL_PATTERN.fullmatch(email):
+            flash('Please enter a valid email address', 'error')
+            return render_template('register.html')
+
+        with db_cursor() as cursor:
+            cursor.execute("SELECT * FROM users WHERE email = %s OR username = %s", (email, username))
+            existing_user = cursor.fetchone()
+
         if existing_user:
             flash('Username or email already exists', 'error')
-            cursor.close()
             return render_template('register.html')
-        
-        password_hash = generate_password_hash(password)
-        cursor.execute("INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
-                      (username, email, password_hash))
-        mysql.connection.commit()
-        
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
-        
+
+        password_hash = hash_password(password)
+
         # Create default categories
         default_categories = [
             ('Food & Dining', 'expense'),
@@ -107,16 +362,21 @@ def register():
             ('Income', 'income'),
             ('Other', 'expense')
         ]
-        
-        for cat_name, cat_type in default_categories:
-            cursor.execute("INSERT INTO categories (user_id, name, type) VALUES (%s, %s, %s)",
-                         (user['user_id'], cat_name, cat_type))
-        
-        mysql.connection.commit()
-        cursor.close()
-        
-        session['user_id'] = user['user_id']
-        session['username'] = user['username']
+
+        with db_cursor(commit=True) as cursor:
+            cursor.execute("INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+                          (username, email, password_hash))
+            new_user_id = cursor.lastrowid
+
+            # One literal multi-row INSERT; the user row and the category
+            # seeding commit together so registration is atomic
+            values_sql = ",".join(["(%s, %s, %s)"] * len(default_categories))
+            cursor.execute("INSERT INTO categories (user_id, name, type) VALUES " + values_sql,
+                          [value for cat_name, cat_type in default_categories
+                           for value in (new_user_id, cat_name, cat_type)])
+
+        session['user_id'] = new_user_id
+        session['username'] = username
         
         return redirect(url_for('dashboard'))
     
@@ -125,100 +385,91 @@ def register():
 @app.route('/logout')
 def logout():
     if 'user_id' in session:
-        cursor = mysql.connection.cursor()
-        cursor.execute("INSERT INTO activity_logs (user_id, action) VALUES (%s, %s)",
-                     (session['user_id'], 'Logout'))
-        mysql.connection.commit()
-        cursor.close()
-    
+        log_activity(session['user_id'], 'Logout')
+
     session.clear()
     return redirect(url_for('login'))
 
 # ============= DASHBOARD =============
 
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    user_id = session['user_id']
-    cursor = mysql.connection.cursor()
-    
-    # Get current balance
-    cursor.execute("""
-        SELECT 
-            COALESCE(SUM(CASE WHEN c.type = 'income' THEN t.amount ELSE -t.amount END), 0) as balance
-        FROM transactions t
-        JOIN categories c ON t.category_id = c.category_id
-        WHERE t.user_id = %s
-    """, (user_id,))
-    balance_result = cursor.fetchone()
-    current_balance = float(balance_result['balance']) if balance_result else 0
-    
-    # Get monthly profit
-    cursor.execute("""
-        SELECT COALESCE(SUM(t.amount), 0) as monthly_profit
-        FROM transactions t
-        JOIN categories c ON t.category_id = c.category_id
-        WHERE t.user_id = %s 
-        AND c.type = 'income'
-        AND MONTH(t.transaction_date) = MONTH(CURRENT_DATE())
-        AND YEAR(t.transaction_date) = YEAR(CURRENT_DATE())
-    """, (user_id,))
-    profit_result = cursor.fetchone()
-    monthly_profit = float(profit_result['monthly_profit']) if profit_result else 0
-    
-    # Get monthly loss
-    cursor.execute("""
-        SELECT COALESCE(SUM(t.amount), 0) as monthly_loss
-        FROM transactions t
-        JOIN categories c ON t.category_id = c.category_id
-        WHERE t.user_id = %s 
-        AND c.type = 'expense'
-        AND MONTH(t.transaction_date) = MONTH(CURRENT_DATE())
-        AND YEAR(t.transaction_date) = YEAR(CURRENT_DATE())
-    """, (user_id,))
-    loss_result = cursor.fetchone()
-    monthly_loss = float(loss_result['monthly_loss']) if loss_result else 0
+@cache.memoize(timeout=AGGREGATE_CACHE_TTL)
+def _dashboard_data(user_id, ym):
+    """Fetch the dashboard aggregates, cached per user and month.
+
+    The month key (ym) makes entries roll over naturally at month
+    boundaries; transaction writes invalidate the current entry.
+    """
+    cursor = get_db().cursor()
+
+    # Get balance and current-month totals from the rollup in a single
+    # round trip
+    cursor.execute(SQL_DASHBOARD_TOTALS, (ym, ym, user_id))
+    totals = cursor.fetchone()
+    current_balance = float(totals['balance']) if totals else 0
+    monthly_profit = float(totals['monthly_profit']) if totals else 0
+    monthly_loss = float(totals['monthly_loss']) if totals else 0
     
-    # Get recent transactions
-    cursor.execute("""
-        SELECT t.*, c.name as category_name, c.type as transaction_type
-        FROM transactions t
-        JOIN categories c ON t.category_id = c.category_id
-        WHERE t.user_id = %s
-        ORDER BY t.transaction_date DESC
-        LIMIT 20
-    """, (user_id,))
+    # Fetch recent transactions, categories and the rollup spending
+    # breakdown as a single multi-statement round trip
+    cursor.execute(
+        ";".join((SQL_RECENT_TRANSACTIONS, SQL_USER_CATEGORIES, SQL_CATEGORY_SPENDING)),
+        (user_id, user_id, ym, user_id))
     transactions = cursor.fetchall()
-    
-    # Get categories
-    cursor.execute("SELECT * FROM categories WHERE user_id = %s", (user_id,))
+    cursor.nextset()
     categories = cursor.fetchall()
-    
-    # Get spending by category
-    cursor.execute("""
-        SELECT c.name, COALESCE(SUM(t.amount), 0) as total
-        FROM categories c
-        LEFT JOIN transactions t ON c.category_id = t.category_id 
-            AND MONTH(t.transaction_date) = MONTH(CURRENT_DATE())
-            AND YEAR(t.transaction_date) = YEAR(CURRENT_DATE())
-        WHERE c.user_id = %s AND c.type = 'expense'
-        GROUP BY c.category_id, c.name
-    """, (user_id,))
-    category_spending = cursor.fetchall()
-    
+    cursor.nextset()
+    rows = cursor.fetchall()
+
+    # Convert the DECIMAL spending column to floats in one NumPy pass
+    totals_arr = np.fromiter((r['total'] for r in rows), dtype=np.float64, count=len(rows))
+    category_spending = [{'name': r['name'], 'total': t}
+                         for r, t in zip(rows, totals_arr.tolist())]
+
     cursor.close()
-    
-    return render_template('dashboard.html', 
+
+    return {
+        'current_balance': current_balance,
+        'monthly_profit': monthly_profit,
+        'monthly_loss': monthly_loss,
+        'transactions': transactions,
+        'categories': categories,
+        'category_spending': category_spending
+    }
+
+@app.route('/dashboard')
+@login_required
+def dashboard():
+    user_id = session['user_id']
+    data = _dashboard_data(user_id, datetime.now().strftime('%Y-%m'))
+    return render_template('dashboard.html',
                          username=session['username'],
-                         current_balance=current_balance,
-                         monthly_profit=monthly_profit,
-                         monthly_loss=monthly_loss,
-                         transactions=transactions,
-                         categories=categories,
-                         category_spending=category_spending)
+                         **data)
+
+def _category_map(user_id):
+    """Return this session's {category name: id} map, loading it once.
+
+    Categories are only seeded at registration, so the map stays valid
+    for the life of the session; drop session['cat_map'] here if
+    category CRUD is ever added.
+    """
+    cat_map = session.get('cat_map')
+    if cat_map is None:
+        with db_cursor() as cursor:
+            cursor.execute(SQL_CATEGORY_IDS, (user_id,))
+            cat_map = {row['name']: row['category_id'] for row in cursor.fetchall()}
+        session['cat_map'] = cat_map
+    return cat_map
 
 # ============= TRANSACTION ROUTES =============
 
+def invalidate_aggregate_caches(user_id):
+    """Drop the cached dashboard/visual aggregates after a write."""
+    ym = datetime.now().strftime('%Y-%m')
+    cache.delete_memoized(_dashboard_data, user_id, ym)
+    cache.delete_memoized(_visual_data, user_id, ym)
+    if ML_AVAILABLE:
+        _ml()['processor'].invalidate(user_id)
+
 @app.route('/add_transaction', methods=['POST'])
 @login_required
 def add_transaction():
@@ -229,88 +480,125 @@ def add_transaction():
     date = request.form.get('date')
     category_name = request.form.get('category')
     
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT category_id FROM categories WHERE user_id = %s AND name = %s", 
-                  (user_id, category_name))
-    category = cursor.fetchone()
-    
-    if category:
-        cursor.execute("""
-            INSERT INTO transactions (user_id, category_id, amount, description, transaction_date)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (user_id, category['category_id'], amount, description, date))
-        mysql.connection.commit()
-        
-        cursor.execute("INSERT INTO activity_logs (user_id, action) VALUES (%s, %s)",
-                     (user_id, f'Added transaction: {description}'))
-        mysql.connection.commit()
-    
-    cursor.close()
+    # INSERT ... SELECT does the category lookup server-side; rowcount
+    # stays 0 when the category name doesn't exist for this user
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(SQL_INSERT_TRANSACTION,
+                      (user_id, amount, description, date, user_id, category_name))
+        inserted = cursor.rowcount
+
+    if inserted:
+        log_activity(user_id, f'Added transaction: {description}')
+        invalidate_aggregate_caches(user_id)
+
     return redirect(url_for('dashboard'))
 
 @app.route('/delete_transaction/<int:transaction_id>', methods=['POST'])
 @login_required
 def delete_transaction(transaction_id):
     user_id = session['user_id']
-    cursor = mysql.connection.cursor()
-    
-    cursor.execute("DELETE FROM transactions WHERE transaction_id = %s AND user_id = %s",
-                  (transaction_id, user_id))
-    mysql.connection.commit()
-    cursor.close()
-    
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(SQL_DELETE_TRANSACTION, (transaction_id, user_id))
+        deleted = cursor.rowcount
+
+    if deleted:
+        log_activity(user_id, f'Deleted transaction #{transaction_id}')
+        invalidate_aggregate_caches(user_id)
+
     return jsonify({'success': True})
 
 # ============= LOGS PAGE =============
 
+# Date bounds compare the raw column against constants (the end bound is
+# shifted a day instead of DATE()-truncating the column), so the range
+# can ride the (user_id, transaction_date) index
+_LOGS_FILTER_SQL = {
+    'start_date': " AND t.transaction_date >= %s",
+    'end_date': " AND t.transaction_date < DATE_ADD(%s, INTERVAL 1 DAY)",
+    'category': " AND c.name = %s",
+    'type': " AND c.type = %s",
+}
+
+def _build_logs_sql(active):
+    """Return (rows_sql, totals_sql) for a tuple of active filter keys."""
+    filters = ''.join(_LOGS_FILTER_SQL[key] for key in active)
+
+    rows_sql = """
+        SELECT t.*, c.name as category_name, c.type as transaction_type
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.category_id
+        WHERE t.user_id = %s
+    """ + filters + " ORDER BY t.transaction_date DESC LIMIT %s OFFSET %s"
+
+    totals_sql = """
+        SELECT c.type, COUNT(*) as cnt, COALESCE(SUM(t.amount), 0) as total
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.category_id
+        WHERE t.user_id = %s
+    """ + filters + " GROUP BY c.type"
+
+    return rows_sql, totals_sql
+
+# Pre-bake the statement text for every filter combination - 16 subsets
+# of 4 filters - so serving a request is one dict lookup with no string
+# building at all, and MySQL always sees one of 16 fixed digests
+_LOGS_SQL = {
+    shape: _build_logs_sql(shape)
+    for r in range(len(_LOGS_FILTER_SQL) + 1)
+    for shape in combinations(tuple(_LOGS_FILTER_SQL), r)
+}
+
 @app.route('/logs')
 @login_required
 def logs():
     user_id = session['user_id']
-    cursor = mysql.connection.cursor()
+    cursor = get_db().cursor()
     
     # Get filter parameters
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     category = request.args.get('category', '')
     trans_type = request.args.get('type', '')
+
+    # Pagination keeps the result set (and Python memory) bounded
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    try:
+        size = min(max(int(request.args.get('size', 50)), 1), 200)
+    except ValueError:
+        size = 50
     
-    # Build query
-    query = """
-        SELECT t.*, c.name as category_name, c.type as transaction_type
-        FROM transactions t
-        JOIN categories c ON t.category_id = c.category_id
-        WHERE t.user_id = %s
-    """
-    params = [user_id]
-    
-    if start_date:
-        query += " AND DATE(t.transaction_date) >= %s"
-        params.append(start_date)
-    
-    if end_date:
-        query += " AND DATE(t.transaction_date) <= %s"
-        params.append(end_date)
-    
-    if category:
-        query += " AND c.name = %s"
-        params.append(category)
-    
-    if trans_type:
-        query += " AND c.type = %s"
-        params.append(trans_type)
-    
-    query += " ORDER BY t.transaction_date DESC"
-    
-    cursor.execute(query, params)
-    transactions = cursor.fetchall()
-    
-    # Calculate statistics
-    total_income = sum(t['amount'] for t in transactions if t['transaction_type'] == 'income')
-    total_expense = sum(t['amount'] for t in transactions if t['transaction_type'] == 'expense')
+    # Canonicalise the active filters into a shape tuple; the SQL for
+    # each shape is built once and cached
+    filter_values = (('start_date', start_date), ('end_date', end_date),
+                     ('category', category), ('type', trans_type))
+    active = tuple(key for key, value in filter_values if value)
+    params = [user_id] + [value for key, value in filter_values if value]
+
+    rows_sql, totals_sql = _LOGS_SQL[active]
+
+    # The transaction list is the widest result set in the app, so fetch
+    # it through a plain tuple cursor and wrap the rows in namedtuples:
+    # one generated class per query instead of a dict per row. Templates
+    # use attribute access, which works on both row flavours.
+    row_cursor = tuple_cursor()
+    row_cursor.execute(rows_sql, params + [size, (page - 1) * size])
+    transactions = fetch_namedtuples(row_cursor)
+
+    # Let MySQL aggregate the totals over the same filtered set instead
+    # of summing thousands of rows in Python; the totals and count stay
+    # correct across pages because they ignore LIMIT/OFFSET
+    row_cursor.execute(totals_sql, params)
+    stats = fetch_namedtuples(row_cursor)
+    row_cursor.close()
+    total_income = next((float(s.total) for s in stats if s.type == 'income'), 0.0)
+    total_expense = next((float(s.total) for s in stats if s.type == 'expense'), 0.0)
+    total_count = sum(s.cnt for s in stats)
     
     # Get categories
-    cursor.execute("SELECT * FROM categories WHERE user_id = %s", (user_id,))
+    cursor.execute(SQL_USER_CATEGORIES, (user_id,))
     categories = cursor.fetchall()
     
     cursor.close()
@@ -318,13 +606,45 @@ def logs():
     return render_template('logs.html',
                          transactions=transactions,
                          categories=categories,
-                         total_count=len(transactions),
+                         total_count=total_count,
                          total_income=total_income,
                          total_expense=total_expense,
                          start_date=start_date,
                          end_date=end_date,
                          category=category,
-                         trans_type=trans_type)
+                         trans_type=trans_type,
+                         page=page,
+                         size=size,
+                         total_pages=(total_count + size - 1) // size)
+
+@app.route('/logs/export')
+@login_required
+def export_logs():
+    """Stream the user's full transaction history as a JSON array.
+
+    An unbuffered server-side cursor walks the result set row by row, so
+    memory stays constant regardless of history size and the first bytes
+    reach the client before the last row leaves MySQL.
+    """
+    user_id = session['user_id']
+
+    def generate():
+        cursor = streaming_cursor()
+        dumps = app.json.dumps
+        try:
+            cursor.execute(SQL_EXPORT_TRANSACTIONS, (user_id,))
+            yield '{"success": true, "data": ['
+            first = True
+            for row in cursor:
+                row['amount'] = float(row['amount'])
+                yield ('' if first else ',') + dumps(row)
+                first = False
+            yield ']}'
+        finally:
+            cursor.close()
+
+    return Response(stream_with_context(generate()),
+                    mimetype='application/json')
 
 # ============= BUDGET ROUTES =============
 
@@ -332,57 +652,33 @@ def logs():
 @login_required
 def budget():
     user_id = session['user_id']
-    cursor = mysql.connection.cursor()
-    
-    # Get categories
-    cursor.execute("SELECT * FROM categories WHERE user_id = %s", (user_id,))
-    categories = cursor.fetchall()
-    
-    # Get budgets with spending data
-    cursor.execute("""
-        SELECT 
-            b.budget_id,
-            b.limit_amount,
-            b.month_year,
-            c.name as category_name,
-            c.category_id,
-            COALESCE(SUM(t.amount), 0) as spent
-        FROM budgets b
-        LEFT JOIN categories c ON b.category_id = c.category_id
-        LEFT JOIN transactions t ON c.category_id = t.category_id 
-            AND DATE_FORMAT(t.transaction_date, '%%Y-%%m') = b.month_year
-        WHERE b.user_id = %s
-        GROUP BY b.budget_id, b.limit_amount, b.month_year, c.name, c.category_id
-        ORDER BY b.month_year DESC, c.name
-    """, (user_id,))
-    budgets = cursor.fetchall()
-    
-    # Calculate budget status and alerts
-    budget_alerts = []
-    for budget in budgets:
-        spent = float(budget['spent'])
-        limit = float(budget['limit_amount'])
-        percentage = (spent / limit * 100) if limit > 0 else 0
-        
-        budget['percentage'] = percentage
-        budget['status'] = 'safe' if percentage < 75 else ('warning' if percentage < 100 else 'danger')
-        
-        # Generate alerts for over-budget or close to limit
-        if percentage >= 100:
-            budget_alerts.append({
-                'level': 'danger',
-                'icon': '🚨',
-                'message': f'{budget["category_name"]} is over budget! Spent ₹{spent:.2f} of ₹{limit:.2f}'
-            })
-        elif percentage >= 85:
-            budget_alerts.append({
-                'level': 'warning',
-                'icon': '⚠️',
-                'message': f'{budget["category_name"]} is at {percentage:.0f}% of budget limit'
-            })
-    
-    cursor.close()
-    
+    with db_cursor() as cursor:
+        # Get categories
+        cursor.execute(SQL_USER_CATEGORIES, (user_id,))
+        categories = cursor.fetchall()
+
+        # Get budgets with spending data; percentage and status are computed
+        # in the same result set instead of a Python post-processing loop
+        cursor.execute(SQL_BUDGET_OVERVIEW, (user_id,))
+        budgets = cursor.fetchall()
+
+    # Only the alert list still needs Python: filter the prepared rows
+    budget_alerts = [
+        {
+            'level': 'danger',
+            'icon': '🚨',
+            'message': f'{b["category_name"]} is over budget! Spent ₹{b["spent"]:.2f} of ₹{b["limit_amount"]:.2f}'
+        }
+        for b in budgets if b['percentage'] >= 100
+    ] + [
+        {
+            'level': 'warning',
+            'icon': '⚠️',
+            'message': f'{b["category_name"]} is at {b["percentage"]:.0f}% of budget limit'
+        }
+        for b in budgets if 85 <= b['percentage'] < 100
+    ]
+
     return render_template('budget.html',
                          categories=categories,
                          budgets=budgets,
@@ -397,134 +693,110 @@ def create_budget():
     limit_amount = request.form.get('limit_amount')
     month_year = request.form.get('month_year')
     
-    cursor = mysql.connection.cursor()
-    
-    # Get category_id
-    cursor.execute("SELECT category_id FROM categories WHERE user_id = %s AND name = %s",
-                  (user_id, category_name))
-    category = cursor.fetchone()
-    
-    if category:
-        # Check if budget already exists
-        cursor.execute("""
-            SELECT * FROM budgets 
-            WHERE user_id = %s AND category_id = %s AND month_year = %s
-        """, (user_id, category['category_id'], month_year))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            flash('Budget already exists for this category and month', 'error')
-        else:
-            cursor.execute("""
-                INSERT INTO budgets (user_id, category_id, limit_amount, month_year)
-                VALUES (%s, %s, %s, %s)
-            """, (user_id, category['category_id'], limit_amount, month_year))
-            mysql.connection.commit()
+    # Resolve the category from the session-cached name -> id map
+    # instead of a SELECT per submission
+    category_id = _category_map(user_id).get(category_name)
+
+    if category_id:
+        # INSERT IGNORE against the (user, category, month) unique key
+        # replaces the old existence-check SELECT; rowcount says whether
+        # the row was new or a duplicate
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(SQL_INSERT_BUDGET,
+                           (user_id, category_id, limit_amount, month_year))
+            created = cursor.rowcount
+
+        if created:
             flash('Budget created successfully!', 'success')
-    
-    cursor.close()
+        else:
+            flash('Budget already exists for this category and month', 'error')
     return redirect(url_for('budget'))
 
 @app.route('/delete_budget/<int:budget_id>', methods=['POST'])
 @login_required
 def delete_budget(budget_id):
     user_id = session['user_id']
-    cursor = mysql.connection.cursor()
-    
-    cursor.execute("DELETE FROM budgets WHERE budget_id = %s AND user_id = %s",
-                  (budget_id, user_id))
-    mysql.connection.commit()
-    cursor.close()
-    
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(SQL_DELETE_BUDGET, (budget_id, user_id))
+        deleted = cursor.rowcount
+
+    if deleted:
+        log_activity(user_id, f'Deleted budget #{budget_id}')
+
     return jsonify({'success': True})
 
 # ============= VISUAL PAGE =============
 
-@app.route('/visual')
-@login_required
-def visual():
-    user_id = session['user_id']
-    cursor = mysql.connection.cursor()
-    
-    # 1. Category spending for current month (for pie chart)
-    cursor.execute("""
-        SELECT c.name, COALESCE(SUM(t.amount), 0) as total
-        FROM categories c
-        LEFT JOIN transactions t ON c.category_id = t.category_id 
-            AND MONTH(t.transaction_date) = MONTH(CURRENT_DATE())
-            AND YEAR(t.transaction_date) = YEAR(CURRENT_DATE())
-        WHERE c.user_id = %s AND c.type = 'expense'
-        GROUP BY c.category_id, c.name
-        ORDER BY total DESC
-    """, (user_id,))
-    category_spending = cursor.fetchall()
+@cache.memoize(timeout=AGGREGATE_CACHE_TTL)
+def _visual_data(user_id, ym):
+    """Fetch the chart aggregates, cached per user and month."""
+    cursor = get_db().cursor()
+
+    # 1. Category spending for current month (for pie chart),
+    #    served from the materialized monthly rollup
+    cursor.execute(SQL_CATEGORY_SPENDING_DESC, (ym, user_id))
+    rows = cursor.fetchall()
+    totals_arr = np.fromiter((r['total'] for r in rows), dtype=np.float64, count=len(rows))
+    category_spending = [{'name': r['name'], 'total': t}
+                         for r, t in zip(rows, totals_arr.tolist())]
     
     # 2. Monthly trend for last 6 months (for line/bar charts)
-    monthly_data = []
+    # One GROUP BY query replaces the old 12-query per-month loop
+    cursor.execute(SQL_MONTHLY_TREND, (user_id,))
+    rows = cursor.fetchall()
+    trend_arr = np.fromiter((r['total'] for r in rows), dtype=np.float64, count=len(rows))
+    monthly_totals = {(r['ym'], r['type']): t for r, t in zip(rows, trend_arr.tolist())}
+
+    # Exact month arithmetic: stepping back in 30-day jumps drifted and
+    # could produce duplicate or missing month buckets
+    today = datetime.now()
+    months = []
     for i in range(5, -1, -1):
-        date = datetime.now() - timedelta(days=i*30)
-        month = date.strftime('%b %y')
-        
-        # Income
-        cursor.execute("""
-            SELECT COALESCE(SUM(t.amount), 0) as income
-            FROM transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            WHERE t.user_id = %s 
-            AND c.type = 'income'
-            AND MONTH(t.transaction_date) = %s
-            AND YEAR(t.transaction_date) = %s
-        """, (user_id, date.month, date.year))
-        income_result = cursor.fetchone()
-        
-        # Expense
-        cursor.execute("""
-            SELECT COALESCE(SUM(t.amount), 0) as expense
-            FROM transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            WHERE t.user_id = %s 
-            AND c.type = 'expense'
-            AND MONTH(t.transaction_date) = %s
-            AND YEAR(t.transaction_date) = %s
-        """, (user_id, date.month, date.year))
-        expense_result = cursor.fetchone()
-        
-        monthly_data.append({
-            'month': month,
-            'income': float(income_result['income']),
-            'expense': float(expense_result['expense'])
-        })
-    
+        year, month = today.year, today.month - i
+        if month < 1:
+            month += 12
+            year -= 1
+        months.append(datetime(year, month, 1))
+
+    monthly_data = [{
+        'month': m.strftime('%b %y'),
+        'income': monthly_totals.get((m.strftime('%Y-%m'), 'income'), 0.0),
+        'expense': monthly_totals.get((m.strftime('%Y-%m'), 'expense'), 0.0)
+    } for m in months]
+
     # 3. Daily spending for current month
+    # Single day-level GROUP BY instead of one query per day of the month;
+    # half-open month bounds keep the date predicate sargable
     now = datetime.now()
     days_in_month = monthrange(now.year, now.month)[1]
-    daily_spending = []
-    
-    for day in range(1, days_in_month + 1):
-        cursor.execute("""
-            SELECT COALESCE(SUM(t.amount), 0) as amount
-            FROM transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            WHERE t.user_id = %s 
-            AND c.type = 'expense'
-            AND DAY(t.transaction_date) = %s
-            AND MONTH(t.transaction_date) = %s
-            AND YEAR(t.transaction_date) = %s
-        """, (user_id, day, now.month, now.year))
-        result = cursor.fetchone()
-        
-        daily_spending.append({
-            'day': str(day),
-            'amount': float(result['amount'])
-        })
-    
+    month_start = datetime(now.year, now.month, 1)
+    if now.month == 12:
+        next_month_start = datetime(now.year + 1, 1, 1)
+    else:
+        next_month_start = datetime(now.year, now.month + 1, 1)
+
+    cursor.execute(SQL_DAILY_SPENDING, (user_id, month_start, next_month_start))
+    rows = cursor.fetchall()
+    daily_arr = np.fromiter((r['amount'] for r in rows), dtype=np.float64, count=len(rows))
+    daily_totals = {r['d']: t for r, t in zip(rows, daily_arr.tolist())}
+
+    daily_spending = [{'day': str(day), 'amount': daily_totals.get(day, 0.0)}
+                      for day in range(1, days_in_month + 1)]
+
     cursor.close()
-    
-    return render_template('visual.html',
-                         category_spending=category_spending,
-                         monthly_data=monthly_data,
-                         daily_spending=daily_spending)
+
+    return {
+        'category_spending': category_spending,
+        'monthly_data': monthly_data,
+        'daily_spending': daily_spending
+    }
+
+@app.route('/visual')
+@login_required
+def visual():
+    user_id = session['user_id']
+    data = _visual_data(user_id, datetime.now().strftime('%Y-%m'))
+    return render_template('visual.html', **data)
 
 # ============= PROFILE =============
 
@@ -532,24 +804,35 @@ def visual():
 @login_required
 def profile():
     user_id = session['user_id']
-    cursor = mysql.connection.cursor()
-    
-    cursor.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
-    user = cursor.fetchone()
-    
-    cursor.execute("""
-        SELECT * FROM activity_logs 
-        WHERE user_id = %s 
-        ORDER BY log_time DESC 
-        LIMIT 10
-    """, (user_id,))
-    logs = cursor.fetchall()
-    
-    cursor.close()
+    with db_cursor() as cursor:
+        cursor.execute(SQL_USER_BY_ID, (user_id,))
+        user = cursor.fetchone()
+
+        cursor.execute(SQL_RECENT_ACTIVITY, (user_id,))
+        logs = cursor.fetchall()
+
     return render_template('profile.html', user=user, logs=logs)
 
 # ============= ML INSIGHTS ROUTES (ET-AI) =============
 
+# Lazily-initialised ML singletons shared across requests so each call
+# skips reconstructing the processor/analyzer/engine (and any model state
+# the analyzer has loaded from disk)
+_ml_components = {}
+_ml_lock = threading.Lock()
+
+def _ml():
+    """Return the shared ML components, constructing them on first use."""
+    if not _ml_components:
+        with _ml_lock:
+            if not _ml_components:
+                _ml_components.update(
+                    processor=DataProcessor(mysql),
+                    analyzer=SpendingAnalyzer(),
+                    recommender=RecommendationEngine()
+                )
+    return _ml_components
+
 @app.route('/insights')
 @login_required
 def insights():
@@ -571,23 +854,28 @@ def api_ml_insights():
     user_id = session['user_id']
     
     try:
-        # Initialize ML components
-        data_processor = DataProcessor(mysql)
-        analyzer = SpendingAnalyzer()
-        rec_engine = RecommendationEngine()
-        
-        # Get transaction data
-        df = data_processor.get_user_transactions(user_id, months=6)
-        
-        if df is None or len(df) == 0:
+        # Shared ML components
+        ml = _ml()
+        data_processor = ml['processor']
+        analyzer = ml['analyzer']
+        rec_engine = ml['recommender']
+
+        # MySQL pre-aggregates per category, so only a handful of rows
+        # cross the wire instead of the raw transaction history; the
+        # bundle also carries income and savings rate from the same
+        # cursor checkout
+        bundle = data_processor.get_bundle(user_id, months=6)
+        agg_df = bundle['aggregates']
+
+        if agg_df is None:
             return jsonify({
                 'success': False,
                 'message': 'Not enough data. Add at least 10 transactions to get insights.'
             }), 400
-        
+
         # Extract features
-        features = data_processor.extract_features(df)
-        
+        features = data_processor.extract_features_aggregated(agg_df)
+
         if features is None:
             return jsonify({
                 'success': False,
@@ -602,7 +890,7 @@ def api_ml_insights():
         cluster_insights = analyzer.get_cluster_insights(cluster_id, features)
         
         # Get income for better recommendations
-        income = data_processor.get_income_data(user_id, months=6)
+        income = bundle['income']
         monthly_income = income / 6 if income > 0 else None
         
         # Generate recommendations
@@ -619,7 +907,7 @@ def api_ml_insights():
         total_savings = rec_engine.calculate_total_savings_potential(recommendations)
         
         # Calculate savings rate
-        savings_rate = data_processor.calculate_savings_rate(user_id, months=6)
+        savings_rate = bundle['savings_rate']
         
         # Store insights in database
         store_ml_insights(user_id, cluster_id, cluster_insights, recommendations, total_savings)
@@ -630,7 +918,7 @@ def api_ml_insights():
             'recommendations': recommendations,
             'total_savings_potential': total_savings,
             'savings_rate': savings_rate,
-            'category_breakdown': features['category_stats'].to_dict('records'),
+            'category_breakdown': features['category_stats'].to_records(),
             'spending_summary': {
                 'total_expense': features['total_expense'],
                 'num_transactions': features['num_transactions'],
@@ -660,20 +948,20 @@ def api_retrain_model():
         }), 503
     
     try:
-        data_processor = DataProcessor(mysql)
-        analyzer = SpendingAnalyzer()
-        
+        ml = _ml()
+        data_processor = ml['processor']
+        analyzer = ml['analyzer']
+
         user_id = session['user_id']
-        df = data_processor.get_user_transactions(user_id, months=6)
-        
-        if df is None or len(df) < 10:
+        agg_df = data_processor.get_user_aggregates(user_id, months=6)
+        features = data_processor.extract_features_aggregated(agg_df)
+
+        if features is None or features['num_transactions'] < 10:
             return jsonify({
                 'success': False,
                 'message': 'Not enough data to train model'
             }), 400
-        
-        # Extract features
-        features = data_processor.extract_features(df)
+
         feature_vector = data_processor.prepare_clustering_data(features)
         
         # Train model
@@ -690,12 +978,19 @@ def api_retrain_model():
             'message': f'Error retraining model: {str(e)}'
         }), 500
 
-# Helper function to store ML insights
-def store_ml_insights(user_id, cluster_id, insights, recommendations, total_savings):
-    try:
-        cur = mysql.connection.cursor()
-        
-        # Create table if not exists
+# One-time schema guard so store_ml_insights never pays DDL cost per call
+_ml_schema_lock = threading.Lock()
+_ml_schema_ready = False
+
+def _ensure_ml_schema():
+    """Create the ml_insights table once per process lifetime."""
+    global _ml_schema_ready
+    if _ml_schema_ready:
+        return
+    with _ml_schema_lock:
+        if _ml_schema_ready:
+            return
+        cur = get_db().cursor()
         cur.execute("""
             CREATE TABLE IF NOT EXISTS ml_insights (
                 insight_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -710,16 +1005,34 @@ def store_ml_insights(user_id, cluster_id, insights, recommendations, total_savi
                 FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
             )
         """)
-        
-        # Prepare recommendations as JSON string
-        rec_json = json.dumps([
+        get_db().commit()
+        cur.close()
+        _ml_schema_ready = True
+
+# Helper function to store ML insights
+def store_ml_insights(user_id, cluster_id, insights, recommendations, total_savings):
+    try:
+        _ensure_ml_schema()
+        cur = get_db().cursor()
+
+        # Prepare recommendations as JSON string; orjson serialises
+        # through C and is several times faster than stdlib json
+        rec_payload = [
             {
                 'message': r['message'],
                 'savings': r.get('potential_savings', 0),
                 'priority': r.get('priority', 'low')
-            } 
+            }
             for r in recommendations[:5]
-        ])
+        ]
+        if orjson is not None:
+            # Same numpy option as OrjsonProvider: recommendation values
+            # can be numpy scalars, which orjson otherwise rejects
+            rec_json = orjson.dumps(
+                rec_payload, option=orjson.OPT_SERIALIZE_NUMPY
+            ).decode()
+        else:
+            rec_json = json.dumps(rec_payload)
         
         # Insert insights
         cur.execute("""
@@ -737,7 +1050,7 @@ def store_ml_insights(user_id, cluster_id, insights, recommendations, total_savi
             rec_json
         ))
         
-        mysql.connection.commit()
+        get_db().commit()
         cur.close()
         
         return True
@@ -760,7 +1073,7 @@ def api_insight_history():
     user_id = session['user_id']
     
     try:
-        cur = mysql.connection.cursor()
+        cur = get_db().cursor()
         cur.execute("""
             SELECT 
                 spending_persona,
@@ -774,15 +1087,18 @@ def api_insight_history():
         
         history = cur.fetchall()
         cur.close()
-        
-        formatted_history = []
-        for h in history:
-            formatted_history.append({
+
+        # Single comprehension; the datetime is passed through as-is and
+        # serialised by the JSON provider instead of a per-row strftime
+        formatted_history = [
+            {
                 'persona': h['spending_persona'],
                 'savings': float(h['potential_savings']),
-                'date': h['created_at'].strftime('%b %d, %Y')
-            })
-        
+                'date': h['created_at']
+            }
+            for h in history
+        ]
+
         return jsonify({
             'success': True,
             'history': formatted_history
@@ -795,4 +1111,5 @@ def api_insight_history():
         }), 500
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Dev server only; production runs under gunicorn (see gunicorn_conf.py)
+    app.run(debug=os.environ.get('FLASK_DEBUG', '0') == '1')
\ No newline at end of file
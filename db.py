@@ -1,23 +1,138 @@
-# import os
-# from mysql.connector import pooling
-# from dotenv import load_dotenv
-
-# load_dotenv()
-
-# DB_CONFIG = {
-#     "host": os.getenv("DB_HOST", "localhost"),
-#     "user": os.getenv("DB_USER", "root"),
-#     "password": os.getenv("DB_PASSWORD", ""),
-#     "database": os.getenv("DB_NAME", "expense_tracker"),
-#     "port": int(os.getenv("DB_PORT", "3306")),
-# }
-
-# pool = pooling.MySQLConnectionPool(
-#     pool_name="expense_pool",
-#     pool_size=5,
-#     pool_reset_session=True,
-#     **DB_CONFIG
-# )
-
-# def get_conn():
-#     return pool.get_connection()
\ No newline at end of file
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import MySQLdb
+import MySQLdb.cursors
+from MySQLdb.constants import CLIENT
+from dbutils.pooled_db import PooledDB
+from flask import g
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "passwd": os.getenv("DB_PASSWORD", ""),
+    "db": os.getenv("DB_NAME", "expense_tracker"),
+    "port": int(os.getenv("DB_PORT", "3306")),
+}
+
+# Process-wide connection pool. Connections are reused across requests so
+# each request skips the TCP + auth handshake that flask_mysqldb paid on
+# every call to mysql.connection. Built lazily on first use so importing
+# the app never requires a live database and forked gunicorn workers each
+# get their own pool.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PooledDB(
+                    creator=MySQLdb,
+                    mincached=5,
+                    maxcached=20,
+                    maxconnections=50,
+                    blocking=True,
+                    # Autocommit: without it every read-only request
+                    # opens an implicit REPEATABLE READ transaction that
+                    # outlives the request, so the next checkout of the
+                    # same connection reads a stale snapshot. Write
+                    # handlers still call commit() explicitly, which is
+                    # a no-op-safe under autocommit
+                    autocommit=True,
+                    # Skip the rollback-on-return session reset; with
+                    # autocommit on, returned connections have no open
+                    # transaction to roll back
+                    reset=False,
+                    # Allow ';'-joined statement batches (dashboard sends
+                    # its page queries in one round trip)
+                    client_flag=CLIENT.MULTI_STATEMENTS,
+                    cursorclass=MySQLdb.cursors.DictCursor,
+                    **DB_CONFIG,
+                )
+    return _pool
+
+
+def get_db():
+    """Return this request's pooled connection, checking one out on first use."""
+    if 'db' not in g:
+        g.db = get_pool().connection()
+    return g.db
+
+
+@contextmanager
+def db_cursor(commit=False):
+    """Yield a cursor on this request's pooled connection.
+
+    Replaces the cursor/commit/close boilerplate in route handlers: the
+    cursor is always closed on exit, and when ``commit`` is true the
+    connection commits once the block completes. Statements in the same
+    request share one connection either way, courtesy of get_db().
+    """
+    cursor = get_db().cursor()
+    try:
+        yield cursor
+        if commit:
+            g.db.commit()
+    finally:
+        cursor.close()
+
+
+def tuple_cursor():
+    """Return a cursor yielding plain tuples instead of dicts.
+
+    Pair with fetch_namedtuples() for large result sets: one generated
+    row class per query is far cheaper than a dict with hashed string
+    keys per row.
+    """
+    return get_db().cursor(MySQLdb.cursors.Cursor)
+
+
+def streaming_cursor():
+    """Return an unbuffered server-side cursor (SSDictCursor).
+
+    Rows stream from MySQL as they are iterated instead of being
+    materialized by fetchall(), so memory stays flat for arbitrarily
+    large result sets. The cursor must be fully consumed (or closed)
+    before the connection runs another statement.
+    """
+    return get_db().cursor(MySQLdb.cursors.SSDictCursor)
+
+
+def fetch_namedtuples(cursor):
+    """Fetch all remaining rows from a tuple cursor as namedtuples."""
+    Row = namedtuple('Row', [d[0] for d in cursor.description])
+    return [Row._make(r) for r in cursor.fetchall()]
+
+
+def close_db(e=None):
+    """Release the request's connection back to the pool."""
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+
+class _ConnectionProxy:
+    """Drop-in for flask_mysqldb's ``MySQL`` handle.
+
+    ``ml_model.DataProcessor`` expects an object exposing ``.connection``;
+    route that attribute to the pooled per-request connection.
+    """
+
+    @property
+    def connection(self):
+        return get_db()
+
+
+mysql = _ConnectionProxy()
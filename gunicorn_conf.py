@@ -0,0 +1,26 @@
+"""Gunicorn configuration.
+
+Run the app with:
+
+    gunicorn -c gunicorn_conf.py app:app
+
+Threaded workers parallelise the DB-bound requests; keep the pool in
+db.py sized so maxconnections >= workers * concurrency per worker.
+
+For higher connection counts set GUNICORN_WORKER_CLASS=gevent (and
+install gevent); mysqlclient releases the GIL during queries either
+way, but greenlets cost far less than threads per waiting request.
+gevent workers monkey-patch the stdlib themselves via gunicorn.
+"""
+import multiprocessing
+import os
+
+workers = 2 * multiprocessing.cpu_count() + 1
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gthread':
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+else:
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
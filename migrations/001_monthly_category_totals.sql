@@ -0,0 +1,53 @@
+-- Materialized per-month category totals, kept current by triggers on
+-- transactions. Dashboard and chart pages read this table in
+-- O(categories) instead of re-scanning a user's transactions.
+
+CREATE TABLE IF NOT EXISTS monthly_category_totals (
+    user_id INT NOT NULL,
+    category_id INT NOT NULL,
+    ym CHAR(7) NOT NULL,
+    total DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category_id, ym)
+);
+
+-- Backfill from existing transactions
+INSERT INTO monthly_category_totals (user_id, category_id, ym, total)
+SELECT user_id, category_id, DATE_FORMAT(transaction_date, '%Y-%m'), SUM(amount)
+FROM transactions
+GROUP BY user_id, category_id, DATE_FORMAT(transaction_date, '%Y-%m')
+ON DUPLICATE KEY UPDATE total = VALUES(total);
+
+DELIMITER $$
+
+CREATE TRIGGER trg_tx_rollup_insert AFTER INSERT ON transactions
+FOR EACH ROW
+BEGIN
+    INSERT INTO monthly_category_totals (user_id, category_id, ym, total)
+    VALUES (NEW.user_id, NEW.category_id, DATE_FORMAT(NEW.transaction_date, '%Y-%m'), NEW.amount)
+    ON DUPLICATE KEY UPDATE total = total + NEW.amount;
+END$$
+
+CREATE TRIGGER trg_tx_rollup_delete AFTER DELETE ON transactions
+FOR EACH ROW
+BEGIN
+    UPDATE monthly_category_totals
+    SET total = total - OLD.amount
+    WHERE user_id = OLD.user_id
+      AND category_id = OLD.category_id
+      AND ym = DATE_FORMAT(OLD.transaction_date, '%Y-%m');
+END$$
+
+CREATE TRIGGER trg_tx_rollup_update AFTER UPDATE ON transactions
+FOR EACH ROW
+BEGIN
+    UPDATE monthly_category_totals
+    SET total = total - OLD.amount
+    WHERE user_id = OLD.user_id
+      AND category_id = OLD.category_id
+      AND ym = DATE_FORMAT(OLD.transaction_date, '%Y-%m');
+    INSERT INTO monthly_category_totals (user_id, category_id, ym, total)
+    VALUES (NEW.user_id, NEW.category_id, DATE_FORMAT(NEW.transaction_date, '%Y-%m'), NEW.amount)
+    ON DUPLICATE KEY UPDATE total = total + NEW.amount;
+END$$
+
+DELIMITER ;
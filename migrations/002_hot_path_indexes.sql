@@ -0,0 +1,14 @@
+-- Compound indexes for the hot query paths.
+--
+-- transactions is always filtered by user_id and usually restricted or
+-- ordered by transaction_date, then joined on category_id; including
+-- amount makes the dashboard/visual aggregations index-only scans.
+-- categories is looked up by (user_id, name) on every add_transaction
+-- and create_budget, and budgets by (user_id, category_id, month_year)
+-- on the budget page.
+
+CREATE INDEX idx_tx_user_date ON transactions (user_id, transaction_date, category_id, amount);
+
+CREATE INDEX idx_cat_user_name ON categories (user_id, name);
+
+CREATE INDEX idx_budget_user_cat_ym ON budgets (user_id, category_id, month_year);
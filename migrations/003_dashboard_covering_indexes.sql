@@ -0,0 +1,9 @@
+-- Covering indexes for the remaining dashboard-adjacent scans.
+--
+-- activity_logs is read newest-first on the profile page and appended
+-- constantly by the async logger; categories is filtered by
+-- (user_id, type) on every dashboard/visual render.
+
+CREATE INDEX idx_logs_user_time ON activity_logs (user_id, log_time DESC);
+
+CREATE INDEX idx_cat_user_type ON categories (user_id, type, category_id);
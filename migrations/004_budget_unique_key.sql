@@ -0,0 +1,8 @@
+-- Enforce one budget per (user, category, month) in the schema so
+-- create_budget can do a single INSERT IGNORE instead of a
+-- SELECT-then-INSERT round trip. The unique key covers the same columns
+-- as idx_budget_user_cat_ym from 002, which it replaces.
+
+ALTER TABLE budgets
+    ADD UNIQUE KEY uq_budget_user_cat_month (user_id, category_id, month_year),
+    DROP INDEX idx_budget_user_cat_ym;
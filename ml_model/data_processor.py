@@ -1,94 +1,413 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import threading
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import date
+from time import monotonic
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# In-process TTL cache for get_bundle results, keyed (user_id, months).
+# Insight endpoints hit the same window repeatedly within a session; a
+# short TTL turns those repeats into dict lookups while the write paths
+# invalidate eagerly. Plain dict + lock, shared across processors.
+_BUNDLE_TTL = 60  # seconds
+_BUNDLE_MAX = 1024
+_bundle_cache = {}
+_bundle_lock = threading.Lock()
+
+
+def _expense_stats(amounts, is_weekend):
+    """One pass over the expense amounts: (total, max, weekend total)."""
+    total = 0.0
+    max_amount = 0.0
+    weekend = 0.0
+    for i in range(amounts.shape[0]):
+        a = amounts[i]
+        total += a
+        if a > max_amount:
+            max_amount = a
+        if is_weekend[i]:
+            weekend += a
+    return total, max_amount, weekend
+
+
+if numba is not None:
+    _expense_stats = numba.njit(cache=True, fastmath=True)(_expense_stats)
+    # Warm on a tiny input at import so the first real call loads the
+    # cached machine code instead of paying LLVM compilation
+    _expense_stats(np.zeros(1), np.zeros(1, dtype=np.bool_))
+else:
+    def _expense_stats(amounts, is_weekend):
+        """Vectorized fallback: sum, max, and a boolean-weighted dot
+        product for the weekend total - no mask-filtered copy, and no
+        per-element Python loop."""
+        return float(amounts.sum()), float(amounts.max()), float(amounts @ is_weekend)
+
+
+def _months_ago(months):
+    """Today shifted back `months` calendar months, day clamped.
+
+    Matches MySQL's DATE_SUB(CURRENT_DATE(), INTERVAL n MONTH), but
+    binding the result as a plain parameter keeps the date predicate a
+    constant the optimizer can range-seek with on the
+    (user_id, transaction_date) index from migration 002.
+    """
+    today = date.today()
+    year, month = today.year, today.month - months
+    while month < 1:
+        month += 12
+        year -= 1
+    return date(year, month, min(today.day, monthrange(year, month)[1]))
+
+
+@dataclass
+class CategoryStats:
+    """Per-category expense statistics as parallel arrays.
+
+    Structure-of-arrays replacement for the old category_stats
+    DataFrame: column reads are plain ndarray attribute access with none
+    of pandas' per-indexing overhead, which dominated on frames this
+    small.
+    """
+    categories: np.ndarray
+    total: np.ndarray
+    avg: np.ndarray
+    count: np.ndarray
+    std: np.ndarray
+    max_: np.ndarray
+    percentage: np.ndarray
+
+    def __len__(self):
+        return len(self.categories)
+
+    def record(self, i):
+        """Row i as a plain dict of Python scalars."""
+        return {
+            'category': self.categories[i],
+            'total': float(self.total[i]),
+            'avg': float(self.avg[i]),
+            'count': int(self.count[i]),
+            'std': float(self.std[i]),
+            'max': float(self.max_[i]),
+            'percentage': float(self.percentage[i])
+        }
+
+    def to_records(self):
+        """All rows as dicts, mirroring DataFrame.to_dict('records')."""
+        return [self.record(i) for i in range(len(self))]
+
+
+# Standard expense categories; feature vectors keep this order so they
+# stay comparable across users
+STANDARD_CATEGORIES = (
+    'Food & Dining', 'Transportation', 'Shopping',
+    'Entertainment', 'Bills & Utilities', 'Healthcare', 'Other'
+)
+
 
 class DataProcessor:
     """Process transaction data for ML model"""
-    
+
+    # SQL as class-level constants: the statement text is built once at
+    # class creation, and sending byte-identical statements lets the
+    # server reuse its digest-keyed plan structures across calls
+
+    # Only the columns feature extraction reads: description TEXT in
+    # particular would dominate row bandwidth and DataFrame memory
+    _Q_TRANSACTIONS = """
+        SELECT
+            t.amount,
+            t.transaction_date,
+            c.name as category_name,
+            c.type as category_type
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.category_id
+        WHERE t.user_id = %s
+        AND t.transaction_date >= %s
+        ORDER BY t.transaction_date DESC
+    """
+
+    _Q_AGGREGATES = """
+        SELECT
+            c.name as category,
+            COALESCE(SUM(t.amount), 0) as total,
+            COALESCE(AVG(t.amount), 0) as avg,
+            COUNT(*) as count,
+            COALESCE(STDDEV_SAMP(t.amount), 0) as std,
+            COALESCE(MAX(t.amount), 0) as max,
+            COALESCE(SUM(t.amount * t.amount), 0) as sumsq,
+            COALESCE(SUM(CASE WHEN DAYOFWEEK(t.transaction_date) IN (1, 7)
+                         THEN t.amount ELSE 0 END), 0) as weekend_total
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.category_id
+        WHERE t.user_id = %s
+        AND c.type = 'expense'
+        AND t.transaction_date >= %s
+        GROUP BY c.name
+    """
+
+    _Q_TOTALS_BY_TYPE = """
+        SELECT c.type, COALESCE(SUM(t.amount), 0) as total
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.category_id
+        WHERE t.user_id = %s
+        AND t.transaction_date >= %s
+        GROUP BY c.type
+    """
+
     def __init__(self, mysql_connection):
         self.mysql = mysql_connection
-    
+
     def get_user_transactions(self, user_id, months=6):
         """Fetch user transactions from database"""
         cur = self.mysql.connection.cursor()
-        
-        # Get transactions from last N months
-        query = """
-            SELECT 
-                t.transaction_id,
-                t.amount,
-                t.description,
-                t.transaction_date,
-                c.name as category_name,
-                c.type as category_type
-            FROM transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            WHERE t.user_id = %s 
-            AND t.transaction_date >= DATE_SUB(CURRENT_DATE(), INTERVAL %s MONTH)
-            ORDER BY t.transaction_date DESC
-        """
-        
-        cur.execute(query, (user_id, months))
+
+        cur.execute(self._Q_TRANSACTIONS, (user_id, _months_ago(months)))
         transactions = cur.fetchall()
         cur.close()
         
         if not transactions:
             return None
         
-        # Convert to DataFrame
+        # Convert to DataFrame. The two category columns become
+        # categorical: equality masks compare int8 codes instead of one
+        # Python string per row, and each row stores a code, not a
+        # PyObject pointer
         df = pd.DataFrame(transactions)
         df['transaction_date'] = pd.to_datetime(df['transaction_date'])
         df['amount'] = df['amount'].astype(float)
-        
+        df['category_name'] = df['category_name'].astype('category')
+        df['category_type'] = df['category_type'].astype('category')
+
         return df
     
+    def get_user_aggregates(self, user_id, months=6):
+        """Fetch per-category expense aggregates computed by MySQL.
+
+        One GROUP BY query returns at most a row per category, so Python
+        receives a handful of rows instead of the full transaction
+        history. sumsq rides along so the overall sample std can be
+        reconstructed without the raw amounts.
+        """
+        cur = self.mysql.connection.cursor()
+
+        cur.execute(self._Q_AGGREGATES, (user_id, _months_ago(months)))
+        rows = cur.fetchall()
+        cur.close()
+
+        return self._aggregates_frame(rows)
+
+    @staticmethod
+    def _aggregates_frame(rows):
+        """Build the aggregates DataFrame from _Q_AGGREGATES rows."""
+        if not rows:
+            return None
+
+        df = pd.DataFrame(rows)
+        numeric_cols = ['total', 'avg', 'std', 'max', 'sumsq', 'weekend_total']
+        df[numeric_cols] = df[numeric_cols].astype(float)
+
+        return df
+
+    def get_bundle(self, user_id, months=6):
+        """Everything the insights endpoint needs, on a single cursor.
+
+        Runs the category aggregates and the income/expense totals under
+        one connection checkout instead of opening (and pool-checking) a
+        cursor per method. MySQLdb has no client-side prepared-statement
+        API, so reusing the constant statement text above is the lever
+        for server-side plan reuse.
+
+        Results are cached for _BUNDLE_TTL seconds per (user_id, months);
+        write paths call invalidate() to drop a user's entries early.
+        """
+        key = (user_id, months)
+        now = monotonic()
+        with _bundle_lock:
+            hit = _bundle_cache.get(key)
+            if hit is not None and now - hit[0] < _BUNDLE_TTL:
+                return hit[1]
+
+        when = _months_ago(months)
+        cur = self.mysql.connection.cursor()
+
+        cur.execute(self._Q_AGGREGATES, (user_id, when))
+        agg_rows = cur.fetchall()
+
+        cur.execute(self._Q_TOTALS_BY_TYPE, (user_id, when))
+        totals = {row['type']: float(row['total']) for row in cur.fetchall()}
+        cur.close()
+
+        income = totals.get('income', 0.0)
+        expense = totals.get('expense', 0.0)
+        if income > 0:
+            savings_rate = round((income - expense) / income * 100, 2)
+        else:
+            savings_rate = 0.0
+
+        bundle = {
+            'aggregates': self._aggregates_frame(agg_rows),
+            'income': income,
+            'savings_rate': savings_rate
+        }
+
+        with _bundle_lock:
+            if len(_bundle_cache) >= _BUNDLE_MAX:
+                # Sweep expired entries; clear outright if the cache is
+                # genuinely full of live users
+                for stale in [k for k, (ts, _) in _bundle_cache.items()
+                              if now - ts >= _BUNDLE_TTL]:
+                    del _bundle_cache[stale]
+                if len(_bundle_cache) >= _BUNDLE_MAX:
+                    _bundle_cache.clear()
+            _bundle_cache[key] = (now, bundle)
+
+        return bundle
+
+    def invalidate(self, user_id):
+        """Drop cached bundles for a user after a write."""
+        with _bundle_lock:
+            for key in [k for k in _bundle_cache if k[0] == user_id]:
+                del _bundle_cache[key]
+
+    def extract_features_aggregated(self, agg_df):
+        """Build the ML feature dict from pre-aggregated category rows.
+
+        Produces the same structure as extract_features, but from the
+        output of get_user_aggregates - no per-transaction DataFrame is
+        ever materialized.
+        """
+        if agg_df is None or len(agg_df) == 0:
+            return None
+
+        total_expense = float(agg_df['total'].sum())
+        num_transactions = int(agg_df['count'].sum())
+        weekend_spending = float(agg_df['weekend_total'].sum())
+        max_transaction = float(agg_df['max'].max())
+        mean = total_expense / num_transactions
+
+        # Overall sample std (pandas ddof=1) reconstructed from the
+        # per-category sums of squares
+        if num_transactions > 1:
+            sumsq = float(agg_df['sumsq'].sum())
+            variance = (sumsq - num_transactions * mean * mean) / (num_transactions - 1)
+            std = float(np.sqrt(max(variance, 0.0)))
+        else:
+            std = 0.0
+
+        totals = agg_df['total'].to_numpy()
+        category_stats = CategoryStats(
+            categories=agg_df['category'].to_numpy(),
+            total=totals,
+            avg=agg_df['avg'].to_numpy(),
+            count=agg_df['count'].to_numpy(dtype=np.int64),
+            std=agg_df['std'].to_numpy(),
+            max_=agg_df['max'].to_numpy(),
+            percentage=np.round(totals / total_expense * 100, 2)
+        )
+
+        top_i = int(totals.argmax())
+
+        return {
+            'total_expense': total_expense,
+            'num_transactions': num_transactions,
+            'avg_transaction': mean,
+            'std_transaction': std,
+            'max_transaction': max_transaction,
+            'weekend_spending_ratio': weekend_spending / total_expense if total_expense > 0 else 0,
+            'category_stats': category_stats,
+            'num_categories': len(category_stats),
+            'top_category': category_stats.categories[top_i],
+            'top_category_percentage': category_stats.percentage[top_i]
+        }
+
     def extract_features(self, df):
-        """Extract ML features from transaction data"""
+        """Extract ML features from raw transaction rows.
+
+        Kept as the fallback for callers that already hold a
+        get_user_transactions DataFrame; the aggregated path above is
+        preferred when only the features are needed.
+        """
         if df is None or len(df) == 0:
             return None
         
-        # Filter only expenses
-        expenses_df = df[df['category_type'] == 'expense'].copy()
-        
-        if len(expenses_df) == 0:
+        # Mask the columns the features need into local arrays instead
+        # of materializing a filtered copy of the frame
+        expense_mask = (df['category_type'] == 'expense').to_numpy()
+        n_expenses = int(expense_mask.sum())
+
+        if n_expenses == 0:
             return None
-        
-        # Calculate total expenses
-        total_expense = expenses_df['amount'].sum()
-        
-        # Category-wise aggregation
-        category_stats = expenses_df.groupby('category_name').agg({
-            'amount': ['sum', 'mean', 'count', 'std', 'max']
-        }).reset_index()
-        
-        category_stats.columns = ['category', 'total', 'avg', 'count', 'std', 'max']
-        
-        # Calculate percentages
-        category_stats['percentage'] = (category_stats['total'] / total_expense * 100).round(2)
-        
-        # Fill NaN standard deviations with 0 (for categories with only 1 transaction)
-        category_stats['std'] = category_stats['std'].fillna(0)
-        
-        # Add temporal features
-        expenses_df['day_of_week'] = expenses_df['transaction_date'].dt.dayofweek
-        expenses_df['is_weekend'] = expenses_df['day_of_week'].isin([5, 6]).astype(int)
-        
-        # Weekend vs weekday spending
-        weekend_spending = expenses_df[expenses_df['is_weekend'] == 1]['amount'].sum()
-        weekday_spending = expenses_df[expenses_df['is_weekend'] == 0]['amount'].sum()
-        
+
+        amounts = df['amount'].to_numpy(dtype=np.float64)[expense_mask]
+        dates = df['transaction_date'].to_numpy()[expense_mask]
+
+        # Weekday straight from the datetime64 day counts: the Unix
+        # epoch was a Thursday, so (days + 3) % 7 gives Monday == 0 and
+        # >= 5 is Saturday or Sunday - no .dt accessor pass
+        dow = (dates.astype('datetime64[D]').view('int64') + 3) % 7
+        weekend_mask = dow >= 5
+
+        # Total, max and weekend spending in a single pass over the raw
+        # arrays (compiled when numba is installed, NumPy otherwise)
+        total_expense, max_transaction, weekend_spending = _expense_stats(amounts, weekend_mask)
+        weekday_spending = total_expense - weekend_spending
+
+        # Category-wise aggregation: hash the category column to integer
+        # codes once, then derive every statistic from bincount-style
+        # reductions instead of five separate groupby reducers
+        # Reuse the column's existing codes; dropping unused categories
+        # keeps income-only names out of the bincount domain
+        cat = df['category_name'].array[expense_mask].remove_unused_categories()
+        codes = cat.codes.astype(np.intp)
+        n_cats = len(cat.categories)
+
+        tot = np.bincount(codes, weights=amounts, minlength=n_cats)
+        cnt = np.bincount(codes, minlength=n_cats)
+        sq = np.bincount(codes, weights=amounts * amounts, minlength=n_cats)
+
+        mean = tot / cnt
+        # Sample std (ddof=1, matching DataFrame.std), zero where a
+        # category has a single transaction
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (sq - cnt * mean * mean) / (cnt - 1)
+        std = np.sqrt(np.where(cnt > 1, np.maximum(var, 0.0), 0.0))
+
+        # Per-category max: one reduceat over amounts grouped by code
+        order = np.argsort(codes, kind='stable')
+        group_starts = np.searchsorted(codes[order], np.arange(n_cats))
+        max_per_cat = np.maximum.reduceat(amounts[order], group_starts)
+
+        category_stats = CategoryStats(
+            categories=np.asarray(cat.categories),
+            total=tot,
+            avg=mean,
+            count=cnt,
+            std=std,
+            max_=max_per_cat,
+            percentage=np.round(tot / total_expense * 100, 2)
+        )
+
+        # Top category via one O(K) argmax instead of two partial sorts
+        top_i = int(tot.argmax())
+
         # Create feature vector for clustering
         features = {
             'total_expense': total_expense,
-            'num_transactions': len(expenses_df),
-            'avg_transaction': expenses_df['amount'].mean(),
-            'std_transaction': expenses_df['amount'].std(),
-            'max_transaction': expenses_df['amount'].max(),
+            'num_transactions': n_expenses,
+            'avg_transaction': total_expense / n_expenses,
+            'std_transaction': float(np.std(amounts, ddof=1)) if n_expenses > 1 else 0.0,
+            'max_transaction': max_transaction,
             'weekend_spending_ratio': weekend_spending / total_expense if total_expense > 0 else 0,
             'category_stats': category_stats,
             'num_categories': len(category_stats),
-            'top_category': category_stats.nlargest(1, 'total').iloc[0]['category'] if len(category_stats) > 0 else None,
-            'top_category_percentage': category_stats.nlargest(1, 'total').iloc[0]['percentage'] if len(category_stats) > 0 else 0
+            'top_category': category_stats.categories[top_i],
+            'top_category_percentage': category_stats.percentage[top_i]
         }
         
         return features
@@ -99,23 +418,12 @@ class DataProcessor:
             return None
         
         category_stats = features['category_stats']
-        
-        # Create a feature vector with percentages for each category
-        feature_vector = []
-        
-        # Standard categories (ensure consistency across users)
-        standard_categories = [
-            'Food & Dining', 'Transportation', 'Shopping', 
-            'Entertainment', 'Bills & Utilities', 'Healthcare', 'Other'
-        ]
-        
-        for cat in standard_categories:
-            cat_data = category_stats[category_stats['category'] == cat]
-            if len(cat_data) > 0:
-                feature_vector.append(cat_data.iloc[0]['percentage'])
-            else:
-                feature_vector.append(0.0)
-        
+
+        # One pass builds a {category: percentage} map; each standard
+        # category is then an O(1) get instead of a boolean-mask scan
+        pct_map = dict(zip(category_stats.categories, category_stats.percentage))
+        feature_vector = [pct_map.get(cat, 0.0) for cat in STANDARD_CATEGORIES]
+
         # Add behavioral features
         feature_vector.extend([
             features['avg_transaction'] / 1000,  # Normalize to thousands
@@ -123,42 +431,32 @@ class DataProcessor:
             features['weekend_spending_ratio'] * 100,
             features['num_transactions'] / 10  # Normalize transaction count
         ])
-        
-        return np.array(feature_vector).reshape(1, -1)
+
+        # fp32 is plenty of precision for percentages and halves what the
+        # scaler and model read
+        return np.array(feature_vector, dtype=np.float32).reshape(1, -1)
     
-    def get_income_data(self, user_id, months=6):
-        """Get income data for comparison"""
+    def _totals_by_type(self, user_id, months=6):
+        """Income and expense totals for the window, in one round trip."""
         cur = self.mysql.connection.cursor()
-        
-        query = """
-            SELECT COALESCE(SUM(t.amount), 0) as total_income
-            FROM transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            WHERE t.user_id = %s 
-            AND c.type = 'income'
-            AND t.transaction_date >= DATE_SUB(CURRENT_DATE(), INTERVAL %s MONTH)
-        """
-        
-        cur.execute(query, (user_id, months))
-        result = cur.fetchone()
+
+        cur.execute(self._Q_TOTALS_BY_TYPE, (user_id, _months_ago(months)))
+        totals = {row['type']: float(row['total']) for row in cur.fetchall()}
         cur.close()
-        
-        return float(result['total_income']) if result else 0.0
-    
+
+        return totals.get('income', 0.0), totals.get('expense', 0.0)
+
+    def get_income_data(self, user_id, months=6):
+        """Get income data for comparison"""
+        return self._totals_by_type(user_id, months)[0]
+
     def calculate_savings_rate(self, user_id, months=6):
         """Calculate user's savings rate"""
-        df = self.get_user_transactions(user_id, months)
-        
-        if df is None or len(df) == 0:
-            return 0.0
-        
-        total_income = df[df['category_type'] == 'income']['amount'].sum()
-        total_expense = df[df['category_type'] == 'expense']['amount'].sum()
-        
+        total_income, total_expense = self._totals_by_type(user_id, months)
+
         if total_income == 0:
             return 0.0
-        
-        savings = total_income - total_expense
-        savings_rate = (savings / total_income) * 100
-        
+
+        savings_rate = (total_income - total_expense) / total_income * 100
+
         return round(savings_rate, 2)
\ No newline at end of file
@@ -1,24 +1,77 @@
+import numpy as np
+from types import MappingProxyType
+
+# Shared lookup tables, built once at import. MappingProxyType keeps
+# them read-only so no caller can mutate state shared across requests.
+
+# Optimal spending benchmarks (as percentage of income)
+_OPTIMAL_RANGES = MappingProxyType({
+    'Food & Dining': (15, 25),
+    'Transportation': (10, 15),
+    'Shopping': (5, 15),
+    'Entertainment': (5, 10),
+    'Bills & Utilities': (15, 25),
+    'Healthcare': (5, 10),
+    'Other': (5, 10)
+})
+
+# Reduction targets based on overspending
+_REDUCTION_TARGETS = MappingProxyType({
+    'mild': 0.10,    # 10% reduction
+    'moderate': 0.20, # 20% reduction
+    'severe': 0.30   # 30% reduction
+})
+
+_PRIORITY_MAP = MappingProxyType({
+    'severe': 'critical',
+    'moderate': 'high',
+    'mild': 'medium'
+})
+
+_CATEGORY_TIPS = MappingProxyType({
+    'Food & Dining': {
+        'severe': "Cook at home 5 days/week, limit dining out to special occasions",
+        'moderate': "Meal prep on weekends, pack lunch 3 days/week",
+        'mild': "Try cooking one new recipe weekly instead of ordering out"
+    },
+    'Shopping': {
+        'severe': "Implement a 30-day rule: wait 30 days before any non-essential purchase",
+        'moderate': "Set a weekly shopping budget and stick to it",
+        'mild': "Make a shopping list and avoid impulse buys"
+    },
+    'Entertainment': {
+        'severe': "Switch to free activities: parks, hiking, home movie nights",
+        'moderate': "Limit paid entertainment to 2 times per month",
+        'mild': "Look for early-bird discounts and group deals"
+    },
+    'Transportation': {
+        'severe': "Consider carpooling or public transport for daily commute",
+        'moderate': "Combine errands to reduce fuel costs",
+        'mild': "Maintain vehicle regularly to improve fuel efficiency"
+    },
+    'Bills & Utilities': {
+        'severe': "Audit all subscriptions, cancel unused services",
+        'moderate': "Switch to energy-efficient appliances",
+        'mild': "Turn off lights/AC when not in use"
+    }
+})
+
+_PRIORITY_ORDER = MappingProxyType({'critical': 0, 'high': 1, 'medium': 2, 'low': 3})
+
+_DEFAULT_TIPS = MappingProxyType({
+    'severe': "Track every expense and set strict category limits",
+    'moderate': "Review this category weekly and find alternatives",
+    'mild': "Look for ways to optimize spending"
+})
+
+
 class RecommendationEngine:
     """Generate personalized spending recommendations"""
-    
+
     def __init__(self):
-        # Optimal spending benchmarks (as percentage of income)
-        self.optimal_ranges = {
-            'Food & Dining': (15, 25),
-            'Transportation': (10, 15),
-            'Shopping': (5, 15),
-            'Entertainment': (5, 10),
-            'Bills & Utilities': (15, 25),
-            'Healthcare': (5, 10),
-            'Other': (5, 10)
-        }
-        
-        # Reduction targets based on overspending
-        self.reduction_targets = {
-            'mild': 0.10,    # 10% reduction
-            'moderate': 0.20, # 20% reduction
-            'severe': 0.30   # 30% reduction
-        }
+        # Aliases for callers that inspect the engine's configuration
+        self.optimal_ranges = _OPTIMAL_RANGES
+        self.reduction_targets = _REDUCTION_TARGETS
     
     def generate_recommendations(self, features, cluster_insights, income=None):
         """Generate personalized recommendations"""
@@ -52,50 +105,55 @@ class RecommendationEngine:
         
         return recommendations
     
+    # Severity bands indexed by np.select outcome: mild, moderate, severe
+    _SEVERITIES = ('mild', 'moderate', 'severe')
+    _MESSAGE_PREFIXES = ("💡 SUGGESTION", "⚡ OPPORTUNITY", "⚠️ HIGH ALERT")
+
     def _analyze_high_spending(self, category_stats, total_expense):
         """Identify high-spend categories and calculate savings"""
+        # Pick the top three categories and classify every one in a
+        # single np.select pass instead of an if/elif chain per row;
+        # only the message formatting still loops, over <= 3 items
+        top = np.argsort(-category_stats.percentage)[:3]
+
+        pct = category_stats.percentage[top]
+        amt = category_stats.total[top]
+        cats = category_stats.categories[top]
+
+        # -1 marks categories below the 20% floor
+        sev_idx = np.select([pct > 35, pct > 25, pct > 20], [2, 1, 0], default=-1)
+        reductions = np.array([_REDUCTION_TARGETS[s] for s in self._SEVERITIES])
+        red = reductions[np.clip(sev_idx, 0, None)]
+        savings = amt * red
+
         recommendations = []
-        
-        # Sort by percentage descending
-        sorted_cats = category_stats.sort_values('percentage', ascending=False)
-        
-        for idx, row in sorted_cats.head(3).iterrows():
-            category = row['category']
-            percentage = row['percentage']
-            amount = row['total']
-            
-            # Determine severity and reduction target
-            if percentage > 35:
-                severity = 'severe'
-                message_prefix = "⚠️ HIGH ALERT"
-            elif percentage > 25:
-                severity = 'moderate'
-                message_prefix = "⚡ OPPORTUNITY"
-            elif percentage > 20:
-                severity = 'mild'
-                message_prefix = "💡 SUGGESTION"
-            else:
+        for i in range(len(top)):
+            if sev_idx[i] < 0:
                 continue  # Skip categories below 20%
-            
-            reduction_pct = self.reduction_targets[severity]
-            potential_savings = amount * reduction_pct
-            
-            recommendation = {
+
+            # float() casts keep numpy scalars out of the emitted dicts,
+            # matching CategoryStats.record(); downstream JSON and DB
+            # parameter escaping both expect plain Python floats
+            severity = self._SEVERITIES[sev_idx[i]]
+            reduction_pct = float(red[i])
+            potential_savings = float(savings[i])
+            category = cats[i]
+            percentage = float(pct[i])
+
+            recommendations.append({
                 'type': 'high_spend',
                 'priority': self._get_priority(severity),
                 'category': category,
                 'current_percentage': percentage,
-                'current_amount': amount,
+                'current_amount': float(amt[i]),
                 'severity': severity,
                 'reduction_percentage': reduction_pct * 100,
                 'potential_savings': potential_savings,
-                'message': f"{message_prefix}: You spend {percentage:.1f}% on {category}. "
+                'message': f"{self._MESSAGE_PREFIXES[sev_idx[i]]}: You spend {percentage:.1f}% on {category}. "
                           f"Reducing this by {int(reduction_pct * 100)}% could save you ₹{potential_savings:,.0f}/month",
                 'actionable_tip': self._get_category_tip(category, severity)
-            }
-            
-            recommendations.append(recommendation)
-        
+            })
+
         return recommendations
     
     def _weekend_spending_recommendation(self, features):
@@ -146,33 +204,37 @@ class RecommendationEngine:
     
     def _budget_recommendations(self, category_stats, income):
         """Budget allocation recommendations based on income"""
+        cats = category_stats.categories
+        amts = category_stats.total
+
+        # Benchmark bounds as parallel arrays (an infinite ceiling for
+        # categories without one), so overspending is a single
+        # vectorized comparison; the loop only visits offenders
+        bounds = np.array([_OPTIMAL_RANGES.get(c, (0, np.inf)) for c in cats])
+        min_pcts, max_pcts = bounds[:, 0], bounds[:, 1]
+        cur_pcts = amts / income * 100
+
         recommendations = []
-        
-        for idx, row in category_stats.iterrows():
-            category = row['category']
-            current_amount = row['total']
-            current_pct = (current_amount / income) * 100
-            
-            if category in self.optimal_ranges:
-                min_pct, max_pct = self.optimal_ranges[category]
-                
-                if current_pct > max_pct:
-                    # Overspending
-                    optimal_amount = income * (max_pct / 100)
-                    savings = current_amount - optimal_amount
-                    
-                    recommendations.append({
-                        'type': 'budget_alignment',
-                        'priority': 'high',
-                        'category': category,
-                        'current_percentage': current_pct,
-                        'optimal_range': f"{min_pct}-{max_pct}%",
-                        'potential_savings': savings,
-                        'message': f"📊 {category}: {current_pct:.1f}% of income (optimal: {min_pct}-{max_pct}%). "
-                                  f"Aligning to budget could save ₹{savings:,.0f}/month",
-                        'actionable_tip': f"Set a monthly {category} budget of ₹{optimal_amount:,.0f}"
-                    })
-        
+        for i in np.flatnonzero(cur_pcts > max_pcts):
+            # float()/int() casts: no numpy scalars in the emitted dicts
+            category = cats[i]
+            current_pct = float(cur_pcts[i])
+            min_pct, max_pct = int(min_pcts[i]), int(max_pcts[i])
+            optimal_amount = income * (max_pct / 100)
+            savings = float(amts[i]) - optimal_amount
+
+            recommendations.append({
+                'type': 'budget_alignment',
+                'priority': 'high',
+                'category': category,
+                'current_percentage': current_pct,
+                'optimal_range': f"{min_pct}-{max_pct}%",
+                'potential_savings': savings,
+                'message': f"📊 {category}: {current_pct:.1f}% of income (optimal: {min_pct}-{max_pct}%). "
+                          f"Aligning to budget could save ₹{savings:,.0f}/month",
+                'actionable_tip': f"Set a monthly {category} budget of ₹{optimal_amount:,.0f}"
+            })
+
         return recommendations
     
     def _cluster_based_recommendation(self, cluster_insights, features):
@@ -204,64 +266,27 @@ class RecommendationEngine:
     
     def _get_priority(self, severity):
         """Map severity to priority"""
-        priority_map = {
-            'severe': 'critical',
-            'moderate': 'high',
-            'mild': 'medium'
-        }
-        return priority_map.get(severity, 'low')
-    
+        return _PRIORITY_MAP.get(severity, 'low')
+
     def _get_category_tip(self, category, severity):
         """Get actionable tip for specific category"""
-        tips = {
-            'Food & Dining': {
-                'severe': "Cook at home 5 days/week, limit dining out to special occasions",
-                'moderate': "Meal prep on weekends, pack lunch 3 days/week",
-                'mild': "Try cooking one new recipe weekly instead of ordering out"
-            },
-            'Shopping': {
-                'severe': "Implement a 30-day rule: wait 30 days before any non-essential purchase",
-                'moderate': "Set a weekly shopping budget and stick to it",
-                'mild': "Make a shopping list and avoid impulse buys"
-            },
-            'Entertainment': {
-                'severe': "Switch to free activities: parks, hiking, home movie nights",
-                'moderate': "Limit paid entertainment to 2 times per month",
-                'mild': "Look for early-bird discounts and group deals"
-            },
-            'Transportation': {
-                'severe': "Consider carpooling or public transport for daily commute",
-                'moderate': "Combine errands to reduce fuel costs",
-                'mild': "Maintain vehicle regularly to improve fuel efficiency"
-            },
-            'Bills & Utilities': {
-                'severe': "Audit all subscriptions, cancel unused services",
-                'moderate': "Switch to energy-efficient appliances",
-                'mild': "Turn off lights/AC when not in use"
-            }
-        }
-        
-        category_tips = tips.get(category, {
-            'severe': "Track every expense and set strict category limits",
-            'moderate': "Review this category weekly and find alternatives",
-            'mild': "Look for ways to optimize spending"
-        })
-        
+        category_tips = _CATEGORY_TIPS.get(category, _DEFAULT_TIPS)
         return category_tips.get(severity, category_tips.get('mild'))
     
     def prioritize_recommendations(self, recommendations):
         """Sort recommendations by priority and impact"""
-        priority_order = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
-        
-        sorted_recs = sorted(
-            recommendations,
-            key=lambda x: (
-                priority_order.get(x.get('priority', 'low'), 4),
-                -x.get('potential_savings', 0)
-            )
-        )
-        
-        return sorted_recs
+        # One float score per recommendation: the priority band dominates
+        # and savings break ties downward. Each of the O(M log M)
+        # comparisons is then a float compare instead of a lambda call
+        # building a (dict.get, negation) tuple
+        scores = [
+            _PRIORITY_ORDER.get(rec.get('priority', 'low'), 4) * 1e12
+            - rec.get('potential_savings', 0)
+            for rec in recommendations
+        ]
+        order = sorted(range(len(recommendations)), key=scores.__getitem__)
+
+        return [recommendations[i] for i in order]
     
     def calculate_total_savings_potential(self, recommendations):
         """Calculate total potential savings from all recommendations"""
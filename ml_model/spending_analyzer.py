@@ -1,8 +1,22 @@
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
-import joblib
 import os
+import threading
+from types import MappingProxyType
+
+# Cluster id -> persona name; read-only and shared by every analyzer
+_CLUSTER_LABELS = MappingProxyType({
+    0: "Budget Master",
+    1: "Balanced Saver",
+    2: "Needs Improvement"
+})
+
+# Loaded (centers, mean, scale) triples keyed by path, shared across
+# analyzer instances so each process reads the artifact at most once
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
 
 class SpendingAnalyzer:
     """ML Model for analyzing spending patterns"""
@@ -11,49 +25,82 @@ class SpendingAnalyzer:
         self.n_clusters = n_clusters
         self.model = None
         self.scaler = StandardScaler()
-        self.cluster_labels = {
-            0: "Budget Master",
-            1: "Balanced Saver", 
-            2: "Needs Improvement"
-        }
-        self.model_path = os.path.join('models', 'kmeans_model.pkl')
-        self.scaler_path = os.path.join('models', 'scaler.pkl')
+        self.cluster_labels = _CLUSTER_LABELS
+        self.model_path = os.path.join('models', 'kmeans_model.npz')
+        # Everything prediction needs: cluster centers plus the scaler's
+        # mean/scale, as plain float32 arrays
+        self._centers = None
+        self._mean = None
+        self._scale = None
     
     def train_model(self, feature_vectors):
         """Train K-Means clustering model"""
+        # float32 halves memory traffic per assignment pass; the
+        # standardized features are already ~unit scale so nothing is
+        # lost to the narrower mantissa
+        feature_vectors = np.asarray(feature_vectors, dtype=np.float32)
+
         if len(feature_vectors) < self.n_clusters:
             # Not enough data, use default clustering
             self.model = KMeans(n_clusters=min(len(feature_vectors), 3), random_state=42)
+        elif len(feature_vectors) >= self.n_clusters * 50:
+            # Large sample: mini-batch assignment passes converge on the
+            # same three personas at a fraction of the full-batch cost
+            self.model = MiniBatchKMeans(n_clusters=self.n_clusters, random_state=42,
+                                         batch_size=256, n_init=3, max_iter=100)
         else:
-            self.model = KMeans(n_clusters=self.n_clusters, random_state=42, n_init=10)
-        
+            self.model = KMeans(n_clusters=self.n_clusters, random_state=42, n_init=3)
+
         # Standardize features
         scaled_features = self.scaler.fit_transform(feature_vectors)
         
         # Train model
         self.model.fit(scaled_features)
-        
+
+        # Keep only the arrays prediction needs
+        self._centers = self.model.cluster_centers_.astype(np.float32)
+        self._mean = self.scaler.mean_.astype(np.float32)
+        self._scale = self.scaler.scale_.astype(np.float32)
+
         # Save model
         self._save_model()
-        
+
         return self.model
-    
+
     def predict_cluster(self, feature_vector):
         """Predict which cluster a user belongs to"""
-        if self.model is None:
+        if self._centers is None:
             self._load_model()
-        
-        if self.model is None:
+
+        if self._centers is None:
             # No model trained yet, return default
             return 1  # Balanced Saver
-        
-        # Standardize features
-        scaled_features = self.scaler.transform(feature_vector)
-        
-        # Predict cluster
-        cluster = self.model.predict(scaled_features)[0]
-        
-        return cluster
+
+        return int(self._assign(np.asarray(feature_vector, dtype=np.float32))[0])
+
+    def predict_clusters_batch(self, feature_matrix):
+        """Predict clusters for many users' feature vectors at once.
+
+        One scaling broadcast and one distance argmin over the whole
+        (n_users, n_features) matrix, instead of a Python->BLAS round
+        trip per user.
+        """
+        if self._centers is None:
+            self._load_model()
+
+        if self._centers is None:
+            return np.ones(len(feature_matrix), dtype=int)  # Balanced Saver
+
+        X = np.ascontiguousarray(feature_matrix, dtype=np.float32)
+        return self._assign(X)
+
+    def _assign(self, X):
+        """Nearest-center assignment for a (n, n_features) float32 matrix"""
+        scaled = (X - self._mean) / self._scale
+        # Squared distance to each of the k centers; k is tiny so the
+        # (n, k, n_features) intermediate stays small
+        dists = ((scaled[:, None, :] - self._centers[None, :, :]) ** 2).sum(axis=-1)
+        return np.argmin(dists, axis=1)
     
     def get_cluster_name(self, cluster_id):
         """Get human-readable cluster name"""
@@ -63,13 +110,14 @@ class SpendingAnalyzer:
     def analyze_cluster_characteristics(self, features, cluster_id):
         """Analyze what makes this cluster unique"""
         category_stats = features['category_stats']
-        
+
         # Get top spending categories
-        top_categories = category_stats.nlargest(3, 'percentage')
-        
+        top_idx = np.argsort(-category_stats.percentage)[:3]
+        top_categories = [category_stats.record(int(i)) for i in top_idx]
+
         characteristics = {
             'spending_level': self._classify_spending_level(features['total_expense']),
-            'top_categories': top_categories.to_dict('records'),
+            'top_categories': top_categories,
             'transaction_frequency': self._classify_frequency(features['num_transactions']),
             'spending_consistency': self._classify_consistency(features['std_transaction'], features['avg_transaction']),
             'weekend_bias': self._classify_weekend_spending(features['weekend_spending_ratio'])
@@ -119,28 +167,38 @@ class SpendingAnalyzer:
             return "Weekend Heavy"
     
     def _save_model(self):
-        """Save trained model to disk"""
+        """Save the cluster centers and scaler stats to disk"""
         try:
             # Create models directory if it doesn't exist
             os.makedirs('models', exist_ok=True)
-            
-            # Save model and scaler
-            joblib.dump(self.model, self.model_path)
-            joblib.dump(self.scaler, self.scaler_path)
-            
+
+            # A handful of float32 arrays is the whole model; no pickled
+            # sklearn objects to version-check on the way back in
+            np.savez(self.model_path, centers=self._centers,
+                     mean=self._mean, scale=self._scale)
+
+            # Keep in-process readers current without a reload
+            with _MODEL_CACHE_LOCK:
+                _MODEL_CACHE[self.model_path] = (self._centers, self._mean, self._scale)
+
             return True
         except Exception as e:
             print(f"Error saving model: {e}")
             return False
-    
+
     def _load_model(self):
-        """Load trained model from disk"""
+        """Load the model arrays, reading the file at most once per process"""
         try:
-            if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
-                self.model = joblib.load(self.model_path)
-                self.scaler = joblib.load(self.scaler_path)
-                return True
-            return False
+            with _MODEL_CACHE_LOCK:
+                cached = _MODEL_CACHE.get(self.model_path)
+                if cached is None:
+                    if not os.path.exists(self.model_path):
+                        return False
+                    with np.load(self.model_path) as data:
+                        cached = (data['centers'], data['mean'], data['scale'])
+                    _MODEL_CACHE[self.model_path] = cached
+            self._centers, self._mean, self._scale = cached
+            return True
         except Exception as e:
             print(f"Error loading model: {e}")
             return False